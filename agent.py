@@ -2,9 +2,17 @@
 from dataclasses import dataclass
 from typing import Sequence
 
+from budget import CallGuard
 from scenarios.definitions import ScenarioDef
 from sut import Turn
 
+# Scenario-independent agent instructions; the leading system message under prompt_layout="shared_prefix".
+AGENT_RULES = (
+    "You are a testing agent simulating a user talking to an AI avatar. "
+    "Follow the scenario instruction given below. "
+    "Generate only the next user message (1-3 sentences). Do not break character."
+)
+
 @dataclass
 class AgentResult:
     message: str
@@ -13,9 +21,19 @@ class AgentResult:
 class TestingAgent:
     """Produces the next user message given scenario and conversation."""
 
-    def __init__(self, use_mock: bool = True, api_key: str = ""):
+    def __init__(
+        self,
+        use_mock: bool = True,
+        api_key: str = "",
+        guard: CallGuard | None = None,
+        prompt_layout: str = "default",
+        persona_context: str = "",
+    ):
         self.use_mock = use_mock or not api_key
         self.api_key = api_key
+        self.guard = guard or CallGuard()
+        self.prompt_layout = prompt_layout
+        self.persona_context = persona_context
         self._client = None
         if not self.use_mock and api_key:
             import openai
@@ -92,16 +110,26 @@ class TestingAgent:
         if not self._client or turn_index >= max_turns:
             return AgentResult(message="Thank you.", done=True)
 
-        sys = (
-            f"You are a testing agent simulating a user. Scenario: {scenario.name}. "
-            f"Instruction: {scenario.agent_instruction} "
-            f"Generate only the next user message (1-3 sentences). Do not break character."
-        )
-        messages = [{"role": "system", "content": sys}]
+        if self.prompt_layout == "shared_prefix":
+            prefix = AGENT_RULES
+            if self.persona_context:
+                prefix += f"\n\nThe avatar under test is configured as: {self.persona_context}"
+            messages = [
+                {"role": "system", "content": prefix},
+                {"role": "system", "content": f"Scenario: {scenario.name}. Instruction: {scenario.agent_instruction}"},
+            ]
+        else:
+            sys = (
+                f"You are a testing agent simulating a user. Scenario: {scenario.name}. "
+                f"Instruction: {scenario.agent_instruction} "
+                f"Generate only the next user message (1-3 sentences). Do not break character."
+            )
+            messages = [{"role": "system", "content": sys}]
         for t in conversation:
             messages.append({"role": t.role, "content": t.content})
 
-        r = self._client.chat.completions.create(
+        r = self.guard.create(
+            self._client,
             model="gpt-4o-mini",
             messages=messages,
         )
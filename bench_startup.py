@@ -0,0 +1,103 @@
+"""Cold-start benchmark: import cost of each CLI entry point, via `python -X importtime`.
+
+Each entry point is imported in a fresh interpreter (its main() is not run). Reports the
+median wall time, the cumulative import time of the entry module, and the heaviest imports,
+and appends one JSON line per run to reports/startup_bench.jsonl so regressions show up
+over time. With --check, exits 1 if a heavy optional dependency leaks into a path that
+should not need it.
+
+Usage: python bench_startup.py [--runs N] [--check]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+from config import Config
+
+# Entry module -> heavy modules it must not import at startup (mock mode, no flags).
+ENTRY_POINTS = {
+    "main": ["openai", "streamlit", "yaml", "numpy", "cProfile", "concurrent.futures"],
+    "demo_cli": ["openai", "streamlit", "yaml", "numpy", "cProfile", "concurrent.futures"],
+    "distributed": ["openai", "streamlit", "yaml", "numpy", "socketserver", "subprocess"],
+    "adversarial": ["openai", "streamlit", "yaml"],
+    "compare": ["openai", "streamlit", "yaml", "numpy", "cProfile", "concurrent.futures"],
+}
+TOP_N = 8
+
+
+def _importtime(module: str) -> list[tuple[str, int, int]]:
+    """(name, self_us, cumulative_us) for every import made by `import module`."""
+    env = dict(os.environ, OPENAI_API_KEY="")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True, env=env, check=True,
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def _wall_ms(module: str, runs: int) -> float:
+    env = dict(os.environ, OPENAI_API_KEY="")
+    times = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], env=env, check=True)
+        times.append((time.perf_counter() - started) * 1000)
+    return statistics.median(times)
+
+
+def bench(runs: int = 5) -> list[dict]:
+    out = []
+    for module, forbidden in ENTRY_POINTS.items():
+        rows = _importtime(module)
+        names = {name for name, _, _ in rows}
+        entry_us = next((cum for name, _, cum in rows if name == module), 0)
+        heaviest = sorted(rows, key=lambda r: -r[1])[:TOP_N]
+        out.append({
+            "entry": module,
+            "wall_ms": round(_wall_ms(module, runs), 1),
+            "import_ms": round(entry_us / 1000, 1),
+            "modules": len(rows),
+            "heaviest": [{"module": n, "self_ms": round(s / 1000, 2)} for n, s, _ in heaviest],
+            "leaked": [m for m in forbidden if m in names],
+        })
+    return out
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    runs = int(args[args.index("--runs") + 1]) if "--runs" in args else 5
+    results = bench(runs)
+
+    baseline = _wall_ms("sys", runs)
+    print(f"Interpreter baseline: {baseline:.1f} ms")
+    for r in results:
+        print(f"{r['entry']}: wall {r['wall_ms']:.1f} ms, imports {r['import_ms']:.1f} ms ({r['modules']} modules)")
+        for h in r["heaviest"]:
+            print(f"    {h['module']}: {h['self_ms']:.2f} ms")
+        if r["leaked"]:
+            print(f"  LEAKED: {', '.join(r['leaked'])}")
+
+    report_dir = Config.report_dir
+    os.makedirs(report_dir, exist_ok=True)
+    path = os.path.join(report_dir, "startup_bench.jsonl")
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"timestamp": datetime.now().isoformat(), "baseline_ms": round(baseline, 1), "entries": results}) + "\n")
+    print(f"Appended: {path}")
+
+    if "--check" in args and any(r["leaked"] for r in results):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,169 @@
+"""Time/token budgets and guarded completion calls (timeouts, accounting, optional hedging)."""
+import math
+import threading
+import time
+from collections import deque
+from typing import Any
+
+
+class BudgetExceeded(Exception):
+    """Raised when a scenario or run has used up its wall-clock or token budget, or was cancelled."""
+
+
+class Budget:
+    """Wall-clock and token limits for one scope; a scenario budget also charges its run budget."""
+
+    def __init__(
+        self,
+        name: str,
+        wall_seconds: float | None = None,
+        max_tokens: int | None = None,
+        parent: "Budget | None" = None,
+    ):
+        self.name = name
+        self.wall_seconds = wall_seconds
+        self.max_tokens = max_tokens
+        self.parent = parent
+        self.tokens_used = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0  # prompt tokens served from the provider's prefix cache
+        self.cancelled = ""
+        self._started = time.monotonic()
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def remaining_seconds(self) -> float | None:
+        own = None if self.wall_seconds is None else self.wall_seconds - self.elapsed()
+        inherited = self.parent.remaining_seconds() if self.parent else None
+        if own is None:
+            return inherited
+        return own if inherited is None else min(own, inherited)
+
+    def charge(self, tokens: int, prompt_tokens: int = 0, cached_tokens: int = 0) -> None:
+        with self._lock:
+            self.tokens_used += tokens
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        if self.parent:
+            self.parent.charge(tokens, prompt_tokens, cached_tokens)
+
+    def cancel(self, reason: str) -> None:
+        """Make the next check() in this scope (and any child scope) raise; safe from another thread."""
+        self.cancelled = reason
+
+    def check(self) -> None:
+        """Cooperative cancellation point: raise BudgetExceeded if this scope or a parent is spent."""
+        if self.parent:
+            self.parent.check()
+        if self.cancelled:
+            raise BudgetExceeded(f"{self.name} cancelled: {self.cancelled}")
+        if self.wall_seconds is not None and self.elapsed() > self.wall_seconds:
+            raise BudgetExceeded(f"{self.name} wall-clock budget of {self.wall_seconds:g}s exceeded")
+        if self.max_tokens is not None and self.tokens_used > self.max_tokens:
+            raise BudgetExceeded(f"{self.name} token budget of {self.max_tokens} exceeded ({self.tokens_used} used)")
+
+
+class CallGuard:
+    """Runs chat completion calls with a per-call timeout, charges usage to the active budget,
+    and optionally hedges: if a call outlives the observed p95 latency, a duplicate is sent
+    and whichever returns first wins."""
+
+    def __init__(self, timeout_s: float = 60.0, hedge: bool = False, hedge_min_samples: int = 20):
+        self.timeout_s = timeout_s
+        self.hedge = hedge
+        self.hedge_min_samples = hedge_min_samples
+        self.budget: Budget | None = None
+        self.hedged_calls = 0
+        self._latencies: deque[float] = deque(maxlen=500)
+        self._lock = threading.Lock()
+        self._pool = None
+        if hedge:
+            from concurrent.futures import ThreadPoolExecutor  # only hedged runs pay for the import
+            self._pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+
+    def p95(self) -> float | None:
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, math.ceil(0.95 * len(ordered)) - 1)]
+
+    def create(self, client: Any, **kwargs: Any) -> Any:
+        """Drop-in for client.chat.completions.create(**kwargs)."""
+        started = time.monotonic()
+        budget = self.budget
+        timeout = self.timeout_s
+        if budget:
+            budget.check()
+            remaining = budget.remaining_seconds()
+            if remaining is not None:
+                timeout = max(0.1, min(timeout, remaining))
+        kwargs.setdefault("timeout", timeout)
+        if hasattr(client, "with_options"):
+            # The SDK retries twice by default, which would stretch a timed-out call to ~3x the timeout
+            # and past the budget; retrying is the scenario's decision, not the transport's.
+            client = client.with_options(max_retries=0)
+
+        p95 = self.p95() if self._pool else None
+        if p95 is None:
+            r = client.chat.completions.create(**kwargs)
+            _charge(budget, r)
+        else:
+            r = self._hedged(client, kwargs, p95, started + timeout, budget)
+        with self._lock:
+            self._latencies.append(time.monotonic() - started)
+        return r
+
+    def _hedged(self, client: Any, kwargs: dict[str, Any], p95: float, deadline: float, budget: Budget | None) -> Any:
+        from concurrent.futures import FIRST_COMPLETED, Future, wait
+
+        # Every call is billed, the losing one included: each future charges its own usage once.
+        charged: set[Future] = set()
+        charge_lock = threading.Lock()
+
+        def charge(f: Future) -> None:
+            with charge_lock:
+                if f in charged:
+                    return
+                charged.add(f)
+            if not f.cancelled() and f.exception() is None:
+                _charge(budget, f.result())
+
+        def submit() -> Future:
+            f = self._pool.submit(client.chat.completions.create, **kwargs)
+            f.add_done_callback(charge)
+            return f
+
+        pending: set[Future] = {submit()}
+        done, pending = wait(pending, timeout=max(0.0, min(p95, deadline - time.monotonic())))
+        if not done and time.monotonic() < deadline:
+            with self._lock:
+                self.hedged_calls += 1
+            pending.add(submit())
+        error: BaseException | None = None
+        while True:
+            for f in done:
+                if f.exception() is None:
+                    charge(f)  # before returning, so the caller's next budget check sees it
+                    return f.result()  # the loser keeps running until its own timeout; its usage is still charged
+                error = f.exception()
+            if not pending:
+                raise error  # type: ignore[misc]
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"completion did not return within {kwargs['timeout']:g}s")
+
+
+def _charge(budget: Budget | None, response: Any) -> None:
+    """Charge a completion's usage (total, prompt and cached prompt tokens) to the budget, if any."""
+    usage = getattr(response, "usage", None)
+    if budget is None or usage is None:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    budget.charge(
+        getattr(usage, "total_tokens", 0) or 0,
+        getattr(usage, "prompt_tokens", 0) or 0,
+        getattr(details, "cached_tokens", 0) or 0,
+    )
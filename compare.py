@@ -0,0 +1,269 @@
+"""Differential regression report between runs, with flaky-scenario detection.
+
+Takes report_<run_id>.json files (or directories of them). The last run is the candidate;
+all earlier runs form the baseline. Per persona/scenario it reports the verdict change,
+the score delta with a permutation-test p-value, and how often the verdict flips across
+the baseline history. Flakiness is judged on the baseline only, so a scenario that was
+stable before and fails in the candidate is a regression, never "flaky". Flaky scenarios
+are listed for re-run; without re-runs they do not block the gate, with --rerun N a flaky
+regression blocks when its re-run pass rate confirms it.
+
+Usage: python compare.py BASELINE.json CANDIDATE.json
+       python compare.py reports/ [--last N] [--rerun N]
+"""
+import glob
+import json
+import os
+import sys
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+
+from config import Config
+from reporter import RunReport
+
+ALPHA = 0.05           # p-value below this = significant score change
+MIN_DELTA = 0.05       # ...and only if the mean score moved at least this much
+FLAKY_THRESHOLD = 0.2  # verdict flips per consecutive baseline sample pair at or above this = flaky
+MIN_FLAKY_SAMPLES = 4  # fewer baseline samples than this: too little history to call anything flaky
+RERUN_PASS_RATE = 0.5  # flaky regression blocks if re-runs pass less often than this and than the baseline
+PERMUTATIONS = 2000
+
+
+@dataclass
+class ScenarioDiff:
+    key: str  # "<persona>/<scenario_id>"
+    scenario_id: str
+    scenario_name: str
+    persona: str
+    baseline_pass_rate: float | None
+    candidate_pass_rate: float | None
+    verdict_change: str  # "regressed" | "fixed" | "unchanged" | "new" | "removed"
+    score_delta: float
+    p_value: float
+    significant: bool
+    flakiness: float
+    flaky: bool
+    samples: int
+
+
+@dataclass
+class CompareReport:
+    baseline_runs: list[str]
+    candidate_run: str
+    diffs: list[ScenarioDiff] = field(default_factory=list)
+    rerun_pass_rates: dict[str, float] = field(default_factory=dict)  # key -> pass rate, flaky scenarios only
+
+    @property
+    def blocking(self) -> list[ScenarioDiff]:
+        """Real regressions: verdict went to fail, or score dropped significantly, and either the
+        scenario is not flaky or its re-runs confirm the regression."""
+        out = []
+        for d in self.diffs:
+            if not (d.verdict_change == "regressed" or (d.significant and d.score_delta < 0)):
+                continue
+            rate = self.rerun_pass_rates.get(d.key)
+            if not d.flaky or (rate is not None and rate < min(RERUN_PASS_RATE, d.baseline_pass_rate or 0.0)):
+                out.append(d)
+        return out
+
+    @property
+    def rerun(self) -> list[ScenarioDiff]:
+        return [d for d in self.diffs if d.flaky]
+
+    def to_dict(self) -> dict:
+        return {
+            "baseline_runs": self.baseline_runs,
+            "candidate_run": self.candidate_run,
+            "blocking": [d.key for d in self.blocking],
+            "rerun": [d.key for d in self.rerun],
+            "rerun_pass_rates": self.rerun_pass_rates,
+            "diffs": [asdict(d) for d in self.diffs],
+        }
+
+    def to_markdown(self) -> str:
+        lines = [
+            "# Regression report",
+            "",
+            f"**Candidate:** {self.candidate_run}  \n**Baseline runs:** {len(self.baseline_runs)}",
+            "",
+            f"**Gate:** {'FAIL' if self.blocking else 'PASS'}  \n**Flaky (re-run):** {len(self.rerun)}",
+            "",
+            "| Scenario | Verdict | Pass rate (base → cand) | Score Δ | p | Flakiness |",
+            "|---|---|---|---|---|---|",
+        ]
+        for d in self.diffs:
+            base = "-" if d.baseline_pass_rate is None else f"{d.baseline_pass_rate:.0%}"
+            cand = "-" if d.candidate_pass_rate is None else f"{d.candidate_pass_rate:.0%}"
+            verdict = d.verdict_change + (" *" if d.significant else "")
+            flaky = f"{d.flakiness:.2f}" + (" FLAKY" if d.flaky else "")
+            if d.key in self.rerun_pass_rates:
+                flaky += f" (re-run {self.rerun_pass_rates[d.key]:.0%})"
+            lines.append(f"| {d.key} | {verdict} | {base} → {cand} | {d.score_delta:+.2f} | {d.p_value:.3f} | {flaky} |")
+        lines += ["", "\\* significant score change (p < %.2f, |Δ| ≥ %.2f)" % (ALPHA, MIN_DELTA), ""]
+        return "\n".join(lines)
+
+
+def load_reports(paths: list[str]) -> list[RunReport]:
+    """Load reports from files and directories; directory contents are ordered by timestamp."""
+    reports: list[RunReport] = []
+    for path in paths:
+        if os.path.isdir(path):
+            batch = []
+            for name in glob.glob(os.path.join(path, "report_*.json")):
+                with open(name, encoding="utf-8") as f:
+                    batch.append(RunReport.from_dict(json.load(f)))
+            reports.extend(sorted(batch, key=lambda r: r.timestamp))
+        else:
+            with open(path, encoding="utf-8") as f:
+                reports.append(RunReport.from_dict(json.load(f)))
+    return reports
+
+
+def permutation_p_value(baseline: list[float], candidate: list[float], seed: int = 0) -> float:
+    """Two-sided permutation test on the difference of mean scores."""
+    if len(baseline) + len(candidate) < 3 or not baseline or not candidate:
+        return 1.0
+    import numpy as np
+
+    combined = np.asarray(baseline + candidate, dtype=np.float64)
+    if np.ptp(combined) == 0:
+        return 1.0
+    n_b = len(baseline)
+    observed = abs(combined[n_b:].mean() - combined[:n_b].mean())
+    rng = np.random.default_rng(seed)
+    shuffled = combined[rng.random((PERMUTATIONS, len(combined))).argsort(axis=1)]
+    diffs = np.abs(shuffled[:, n_b:].mean(axis=1) - shuffled[:, :n_b].mean(axis=1))
+    return float((np.count_nonzero(diffs >= observed - 1e-12) + 1) / (PERMUTATIONS + 1))
+
+
+def _flakiness(verdicts: list[bool]) -> float:
+    if len(verdicts) < 2:
+        return 0.0
+    flips = sum(a != b for a, b in zip(verdicts, verdicts[1:]))
+    return flips / (len(verdicts) - 1)
+
+
+def compare(reports: list[RunReport]) -> CompareReport:
+    """Diff the last report against all earlier ones."""
+    if len(reports) < 2:
+        raise ValueError("need at least two reports (baseline and candidate)")
+    *baseline, candidate = reports
+
+    # key -> per-sample (run index, passed, score), in run order
+    samples: dict[str, list[tuple[int, bool, float]]] = {}
+    names: dict[str, tuple[str, str, str]] = {}
+    for i, report in enumerate(reports):
+        for r in report.results:
+            persona = r.persona or report.persona
+            key = f"{persona}/{r.scenario_id}"
+            samples.setdefault(key, []).append((i, r.passed, r.score))
+            names[key] = (r.scenario_id, r.scenario_name, persona)
+
+    cand_idx = len(reports) - 1
+    diffs = []
+    for key, rows in samples.items():
+        base_rows = [r for r in rows if r[0] < cand_idx]
+        cand_rows = [r for r in rows if r[0] == cand_idx]
+        base_rate = sum(r[1] for r in base_rows) / len(base_rows) if base_rows else None
+        cand_rate = sum(r[1] for r in cand_rows) / len(cand_rows) if cand_rows else None
+        if base_rate is None:
+            change = "new"
+        elif cand_rate is None:
+            change = "removed"
+        elif base_rate >= 0.5 > cand_rate:
+            change = "regressed"
+        elif cand_rate >= 0.5 > base_rate:
+            change = "fixed"
+        else:
+            change = "unchanged"
+
+        base_scores = [r[2] for r in base_rows]
+        cand_scores = [r[2] for r in cand_rows]
+        delta = (sum(cand_scores) / len(cand_scores) - sum(base_scores) / len(base_scores)) if base_scores and cand_scores else 0.0
+        p = permutation_p_value(base_scores, cand_scores)
+        flakiness = _flakiness([r[1] for r in base_rows])
+        scenario_id, scenario_name, persona = names[key]
+        diffs.append(ScenarioDiff(
+            key=key,
+            scenario_id=scenario_id,
+            scenario_name=scenario_name,
+            persona=persona,
+            baseline_pass_rate=base_rate,
+            candidate_pass_rate=cand_rate,
+            verdict_change=change,
+            score_delta=round(delta, 3),
+            p_value=round(p, 4),
+            significant=p < ALPHA and abs(delta) >= MIN_DELTA,
+            flakiness=round(flakiness, 3),
+            flaky=len(base_rows) >= MIN_FLAKY_SAMPLES and flakiness >= FLAKY_THRESHOLD,
+            samples=len(rows),
+        ))
+
+    diffs.sort(key=lambda d: (d.verdict_change != "regressed", d.score_delta))
+    return CompareReport(
+        baseline_runs=[r.run_id for r in baseline],
+        candidate_run=candidate.run_id,
+        diffs=diffs,
+    )
+
+
+def rerun_flaky(result: CompareReport, repetitions: int) -> dict[str, float]:
+    """Re-run each flaky scenario `repetitions` times; return key -> pass rate."""
+    from runner import run_all
+
+    rates: dict[str, float] = {}
+    for d in result.rerun:
+        config = Config(persona=d.persona)
+        config.scenarios = [d.scenario_id]
+        passes = sum(run_all(config).overall_passed for _ in range(repetitions))
+        rates[d.key] = passes / repetitions
+    return rates
+
+
+def write_compare_report(result: CompareReport, report_dir: str) -> tuple[str, str]:
+    """Write JSON and Markdown regression reports; return paths."""
+    os.makedirs(report_dir, exist_ok=True)
+    base = f"compare_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+    json_path = os.path.join(report_dir, f"{base}.json")
+    md_path = os.path.join(report_dir, f"{base}.md")
+    with open(json_path, "w", encoding="utf-8") as f:
+        json.dump(result.to_dict(), f, indent=2)
+    with open(md_path, "w", encoding="utf-8") as f:
+        f.write(result.to_markdown())
+    return json_path, md_path
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    last = int(args[args.index("--last") + 1]) if "--last" in args else None
+    reruns = int(args[args.index("--rerun") + 1]) if "--rerun" in args else 0
+    values = {args[i + 1] for i, a in enumerate(args) if a in ("--last", "--rerun")}
+    paths = [a for a in args if not a.startswith("--") and a not in values]
+    if not paths:
+        print("Usage: python compare.py BASELINE.json CANDIDATE.json | python compare.py reports/ [--last N] [--rerun N]")
+        return 2
+
+    reports = load_reports(paths)
+    if last:
+        reports = reports[-last:]
+    result = compare(reports)
+
+    if reruns and result.rerun:
+        result.rerun_pass_rates = rerun_flaky(result, reruns)
+    json_path, md_path = write_compare_report(result, Config.report_dir)
+
+    print(f"Compared {result.candidate_run} against {len(result.baseline_runs)} baseline run(s)")
+    for d in result.diffs:
+        if d.verdict_change != "unchanged" or d.significant or d.flaky:
+            flags = " ".join(f for f, on in (("significant", d.significant), ("flaky", d.flaky)) if on)
+            print(f"  {d.key}: {d.verdict_change} (Δ {d.score_delta:+.2f}, p={d.p_value:.3f}) {flags}".rstrip())
+    for key, rate in result.rerun_pass_rates.items():
+        print(f"  re-run {key}: pass rate {rate:.0%}")
+    print(f"Report written: {json_path}")
+    print(f"Report written: {md_path}")
+    print(f"Gate: {'FAIL' if result.blocking else 'PASS'}")
+    return 1 if result.blocking else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
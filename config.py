@@ -1,22 +1,45 @@
 """Configuration for the agent-based testing POC."""
 import os
 from dataclasses import dataclass, field
+from functools import lru_cache
 
-try:
-    from dotenv import load_dotenv
-    load_dotenv()
-except ImportError:
-    pass
+
+@lru_cache(maxsize=None)
+def _load_dotenv() -> None:
+    """Read .env on first use rather than at import, so importing config stays cheap."""
+    try:
+        from dotenv import load_dotenv
+        load_dotenv()
+    except ImportError:
+        pass
+
+
+def _env(name: str, default: str = "") -> str:
+    _load_dotenv()
+    return os.getenv(name, default)
 
 
 @dataclass
 class Config:
     """Runtime config: persona, API, and scenario selection."""
     persona: str = "doctor"  # "doctor" | "senior_customer"
-    api_key: str = field(default_factory=lambda: os.getenv("OPENAI_API_KEY", ""))
-    use_mock: bool = field(default_factory=lambda: not bool(os.getenv("OPENAI_API_KEY")))
+    api_key: str = field(default_factory=lambda: _env("OPENAI_API_KEY"))
+    use_mock: bool = field(default_factory=lambda: not bool(_env("OPENAI_API_KEY")))
     max_turns_per_scenario: int = 5
     report_dir: str = "reports"
+    # Budgets: None = unlimited. Exceeding one records a "budget exceeded" result instead of hanging the run.
+    call_timeout_s: float = 60.0
+    scenario_time_budget_s: float | None = None
+    scenario_token_budget: int | None = None
+    run_time_budget_s: float | None = None
+    run_token_budget: int | None = None
+    hedge_requests: bool = False  # re-send a call that outlives the observed p95, take the first reply
+    # "shared_prefix" puts stable agent rules, judge rubric and persona context ahead of
+    # scenario text so provider-side prompt caching can reuse them; "default" keeps the original prompts.
+    # See README "Prompt caching" for when this actually saves tokens.
+    prompt_layout: str = "default"
+    adversarial_budget: int = 200  # probes per adversarial search (1 avatar + 1 judge call each)
+    adversarial_workers: int = 8
     scenarios: list[str] = field(default_factory=lambda: [
         "persona",
         "hallucination",
@@ -0,0 +1,222 @@
+"""Cross-turn consistency analysis for long conversations (local, NumPy only).
+
+Every turn is turned into a hashed word n-gram vector; one matrix product gives
+the full pairwise similarity matrix, from which topic jumps are read off.
+Forgotten details compare the distinctive content words of early user turns,
+later callbacks and the replies; persona drift compares function-word and length
+profiles of early and late avatar turns. No API calls, so it is cheap enough for hundreds of
+turns and thousands of transcripts.
+"""
+import re
+import zlib
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Iterable, Sequence
+
+import numpy as np
+
+from sut import Turn
+
+N_FEATURES = 1 << 12
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:'[a-z]+)?")
+
+# Register/tone markers, grouped so short replies still give a dense profile. Style is compared on
+# these plus sentence/word length, not on content words, so an in-character avatar that moves
+# between topics is not read as drifting.
+FUNCTION_WORD_GROUPS = {
+    "first_person": "i me my mine we our us",
+    "second_person": "you your yours",
+    "third_person": "he she they them it its this that these those",
+    "articles": "a an the",
+    "conjunctions": "and but or so because if then than as",
+    "prepositions": "of in on at to for with about from by",
+    "auxiliaries": "is are was were be been am do does did have has had",
+    "modals": "will would can could should may might must",
+    "negation": "not no never cannot",
+    "politeness": "please thank thanks sorry glad welcome",
+    "interjections": "yes yeah ok okay oh hey well lol cool",
+    "questions": "what why how when where which who",
+}
+_FUNCTION_INDEX = {w: i for i, words in enumerate(FUNCTION_WORD_GROUPS.values()) for w in words.split()}
+
+# Thresholds are similarities in [0, 1]; calibrated on coherent and deliberately drifting
+# mock transcripts (see test_consistency.py).
+MIN_DRIFT_TURNS = 4         # fewer avatar turns than this: too little text to judge drift
+DRIFT_THRESHOLD = 0.5       # early vs late style similarity below this = persona drift
+DISTINCTIVE_SHARE = 0.5     # content word in at most this share of turns = a distinctive detail
+RECALL_SHARE = 0.5          # IDF-weighted share of the referenced detail's words the reply must repeat
+JUMP_THRESHOLD = 0.05       # reply this unrelated to everything said before = jump
+
+
+@dataclass
+class ConsistencyReport:
+    assistant_turns: int
+    persona_stability: float  # 0.0 - 1.0, style similarity of early vs late avatar turns
+    memory_retention: float   # 0.0 - 1.0, share of referenced early details the avatar recalled
+    topic_coherence: float    # 0.0 - 1.0, share of replies that were not sudden jumps
+    persona_drift: bool = False
+    forgotten_turns: list[int] = field(default_factory=list)  # user turns referenced later but not recalled
+    topic_jumps: list[int] = field(default_factory=list)      # avatar turns that jumped topic
+
+    @property
+    def score(self) -> float:
+        return round(0.3 * self.persona_stability + 0.4 * self.memory_retention + 0.3 * self.topic_coherence, 2)
+
+    def metrics(self) -> dict[str, float]:
+        return {
+            "persona_stability": round(self.persona_stability, 2),
+            "memory_retention": round(self.memory_retention, 2),
+            "topic_coherence": round(self.topic_coherence, 2),
+            "forgotten_details": float(len(self.forgotten_turns)),
+            "topic_jumps": float(len(self.topic_jumps)),
+        }
+
+    def reasons(self) -> list[str]:
+        parts = []
+        if self.persona_drift:
+            parts.append("Avatar tone/vocabulary drifted between early and late turns.")
+        if self.forgotten_turns:
+            parts.append(f"Earlier details not recalled when referenced (user turns {self.forgotten_turns}).")
+        if self.topic_jumps:
+            parts.append(f"Sudden topic jumps in avatar turns {self.topic_jumps}.")
+        return parts
+
+
+@lru_cache(maxsize=1 << 16)
+def _bucket(feature: str) -> int:
+    return zlib.crc32(feature.encode("utf-8")) & (N_FEATURES - 1)
+
+
+def _features(text: str) -> list[int]:
+    tokens = _TOKEN_RE.findall(text.lower())
+    grams = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    return [_bucket(g) for g in grams]
+
+
+def _count_matrix(texts: Sequence[str]) -> np.ndarray:
+    """Hashed unigram+bigram counts, one row per text."""
+    rows, cols = [], []
+    for i, text in enumerate(texts):
+        feats = _features(text)
+        rows.extend([i] * len(feats))
+        cols.extend(feats)
+    flat = np.asarray(rows, dtype=np.int64) * N_FEATURES + np.asarray(cols, dtype=np.int64)
+    counts = np.bincount(flat, minlength=len(texts) * N_FEATURES)
+    return counts.reshape(len(texts), N_FEATURES).astype(np.float32)
+
+
+def _normalize(m: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return m / np.where(norms == 0, 1.0, norms)
+
+
+def _style_similarity(early: Sequence[str], late: Sequence[str]) -> float:
+    """Function-word group frequency cosine (70%) and sentence/word length agreement (30%)."""
+    profiles = []
+    for texts in (early, late):
+        tokens = [tok for t in texts for tok in _TOKEN_RE.findall(t.lower())]
+        fw = np.zeros(len(FUNCTION_WORD_GROUPS))
+        for tok in tokens:
+            i = _FUNCTION_INDEX.get(tok)
+            if i is not None:
+                fw[i] += 1
+        sentences = sum(max(1, len(re.findall(r"[.!?]+", t))) for t in texts)
+        lengths = np.array([len(tokens) / sentences, np.mean([len(tok) for tok in tokens]) if tokens else 0.0])
+        profiles.append((fw, lengths))
+    (fw_a, len_a), (fw_b, len_b) = profiles
+    denom = float(np.linalg.norm(fw_a) * np.linalg.norm(fw_b))
+    fw_sim = float(fw_a @ fw_b) / denom if denom else 0.0
+    len_sim = float(np.mean(np.minimum(len_a, len_b) / np.maximum(np.maximum(len_a, len_b), 1e-9)))
+    return float(np.clip(0.7 * fw_sim + 0.3 * len_sim, 0.0, 1.0))
+
+
+def _content_words(text: str) -> set[str]:
+    return {tok for tok in _TOKEN_RE.findall(text.lower()) if tok not in _FUNCTION_INDEX}
+
+
+def analyze(conversation: Sequence[Turn]) -> ConsistencyReport:
+    """Score persona drift, memory of early details and topic jumps for one transcript."""
+    texts = [t.content for t in conversation]
+    is_user = np.array([t.role == "user" for t in conversation], dtype=bool)
+    user_idx = np.flatnonzero(is_user)
+    asst_idx = np.flatnonzero(~is_user)
+    if len(asst_idx) == 0:
+        return ConsistencyReport(0, 1.0, 1.0, 1.0)
+
+    counts = _count_matrix(texts)
+    df = np.count_nonzero(counts, axis=0)
+    idf = np.log((1 + len(texts)) / (1 + df)) + 1.0
+    topic = _normalize(np.log1p(counts) * idf)
+    sim = topic @ topic.T  # full pairwise matrix over all turns, one pass
+
+    # Persona drift: style profile of the first third vs the last third of avatar turns.
+    persona_stability = 1.0
+    if len(asst_idx) >= MIN_DRIFT_TURNS:
+        k = max(2, len(asst_idx) // 3)
+        replies = [texts[i] for i in asst_idx]
+        persona_stability = _style_similarity(replies[:k], replies[-k:])
+
+    # The avatar reply to each user turn is the next assistant turn, if any.
+    reply_of = np.full(len(texts), -1, dtype=np.int64)
+    nxt = np.searchsorted(asst_idx, user_idx)
+    has_reply = nxt < len(asst_idx)
+    reply_of[user_idx[has_reply]] = asst_idx[nxt[has_reply]]
+
+    # Forgotten details: a later user turn shares distinctive words with an early one (refers back to
+    # it), and the reply does not repeat them. A word common to the whole conversation, like "safety"
+    # in a safety discussion, is neither a reference nor evidence of recall.
+    words = [_content_words(t) for t in texts]
+    word_df: dict[str, int] = {}
+    for ws in words:
+        for w in ws:
+            word_df[w] = word_df.get(w, 0) + 1
+    word_idf = {w: np.log((1 + len(texts)) / (1 + df)) + 1.0 for w, df in word_df.items()}
+    distinctive = {w for w, df in word_df.items() if df <= DISTINCTIVE_SHARE * len(texts)}
+
+    def recalled(detail: set[str], reply: int) -> bool:
+        total = sum(word_idf[w] for w in detail)
+        return sum(word_idf[w] for w in detail & words[reply]) >= RECALL_SHARE * total
+
+    forgotten: list[int] = []
+    referenced = 0
+    n_early = max(1, len(user_idx) // 3)
+    for a, i in enumerate(user_idx[:n_early]):
+        callbacks = [
+            (words[i] & words[j] & distinctive, reply_of[j])
+            for j in user_idx[user_idx > i + 1]
+            if reply_of[j] >= 0 and words[i] & words[j] & distinctive
+        ]
+        if not callbacks:
+            continue
+        referenced += 1
+        if not all(recalled(detail, reply) for detail, reply in callbacks):
+            forgotten.append(a)
+    memory_retention = 1.0 - len(forgotten) / referenced if referenced else 1.0
+
+    # Topic jumps: reply unrelated to everything said before it (its prompt included), while the
+    # prompt itself stayed on the running topic. A user who changes topic is not an avatar jump.
+    earlier = np.tril(sim, -1)
+    cur = asst_idx[1:]
+    prompt = cur - 1
+    reply_context = earlier[cur].max(axis=1)
+    prompt_context = np.where(is_user[prompt], earlier[prompt].max(axis=1), 0.0)
+    jumps = [
+        int(n) + 1
+        for n in np.flatnonzero((reply_context < JUMP_THRESHOLD) & (prompt_context >= JUMP_THRESHOLD))
+    ]
+    topic_coherence = 1.0 - len(jumps) / max(1, len(asst_idx) - 1)
+
+    return ConsistencyReport(
+        assistant_turns=len(asst_idx),
+        persona_stability=persona_stability,
+        memory_retention=memory_retention,
+        topic_coherence=topic_coherence,
+        persona_drift=persona_stability < DRIFT_THRESHOLD,
+        forgotten_turns=forgotten,
+        topic_jumps=jumps,
+    )
+
+
+def analyze_many(conversations: Iterable[Sequence[Turn]]) -> list[ConsistencyReport]:
+    """Batch helper for offline sweeps over stored transcripts."""
+    return [analyze(c) for c in conversations]
@@ -1,12 +1,83 @@
-"""Web demo: run scenarios and see conversation + report in the browser."""
+"""Web demo: run scenarios and see conversation + report in the browser.
+
+Single-scenario transcripts are cached data keyed by persona and scenario, so widget
+changes do not replay conversations. Full suites run in a background thread and each
+scenario result shows up as soon as it completes. Clients (and their call guard and
+budget) are built per transcript and per suite job, never shared across sessions.
+"""
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+
 import streamlit as st
+
+from budget import Budget, CallGuard
 from config import Config
-from sut import Turn, MockAvatarSUT, OpenAIAvatarSUT
-from agent import TestingAgent
-from evaluator import Evaluator
-from scenarios.definitions import SCENARIOS, get_scenario
+from evaluator import EvalResult
 from reporter import RunReport, ScenarioResult, write_report
-from runner import run_conversation, run_all
+from runner import build_clients, build_report, new_run_id, run_conversation, run_scenario
+from scenarios.definitions import SCENARIOS, get_scenario
+from sut import Turn
+
+POLL_S = 0.5
+
+
+def new_clients(config: Config) -> tuple:
+    """A fresh avatar/agent/evaluator set with its own call guard; the SUT and guard are stateful."""
+    guard = CallGuard(timeout_s=config.call_timeout_s, hedge=config.hedge_requests)
+    sut, agent, evaluator = build_clients(config, guard)
+    return sut, agent, evaluator, guard
+
+
+@st.cache_data(show_spinner="Running conversation...")
+def get_transcript(
+    persona: str,
+    scenario_id: str,
+    use_mock: bool,
+    max_turns: int,
+    _api_key: str = "",
+) -> tuple[list[Turn], EvalResult]:
+    """Conversation and evaluation for one scenario; replayed only when the key inputs change."""
+    config = Config(persona=persona, api_key=_api_key, use_mock=use_mock)
+    sut, agent, evaluator, _ = new_clients(config)
+    scenario = get_scenario(scenario_id)
+    conversation = run_conversation(sut=sut, agent=agent, scenario=scenario, max_turns=max_turns)
+    return conversation, evaluator.evaluate(scenario, conversation)
+
+
+@dataclass
+class SuiteJob:
+    """A full-suite run on a background thread; results are appended as scenarios finish."""
+    persona: str
+    scenario_ids: list[str]
+    results: list[ScenarioResult] = field(default_factory=list)
+    report: RunReport | None = None
+    md_path: str = ""
+    error: str = ""
+    thread: threading.Thread | None = None
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+
+def _run_suite(job: SuiteJob, config: Config) -> None:
+    # Runs off the script thread: no st.* calls in here. Any failure, client construction
+    # included, must land in job.error or the page would poll a dead thread forever.
+    run_id, timestamp = new_run_id(), datetime.now().isoformat()
+    run_budget = Budget("run", config.run_time_budget_s, config.run_token_budget)
+    try:
+        sut, agent, evaluator, guard = new_clients(config)
+        for scenario_id in job.scenario_ids:
+            scenario = get_scenario(scenario_id)
+            job.results.append(run_scenario(sut, agent, evaluator, guard, scenario, config, run_budget))
+        job.report = build_report(run_id, timestamp, config.persona, job.scenario_ids, list(job.results))
+        _, job.md_path = write_report(job.report, config.report_dir)
+    except Exception as e:
+        job.error = str(e)
+
 
 st.set_page_config(page_title="Agent Testing Demo", page_icon="🤖", layout="wide")
 
@@ -21,17 +92,12 @@ selected_scenarios = st.sidebar.multiselect(
     default=["persona", "safety"],
 )
 run_single = st.sidebar.checkbox("Demo single scenario (show each turn)", value=True)
+# Key typed here is kept in the widget only; falls back to the environment.
+api_key = st.sidebar.text_input("OPENAI_API_KEY (optional)", type="password") or Config().api_key
 
-config = Config()
-config.persona = persona
+config = Config(persona=persona, api_key=api_key, use_mock=not api_key)
 config.scenarios = selected_scenarios if selected_scenarios else scenario_ids
-config.use_mock = not bool(st.sidebar.text_input("OPENAI_API_KEY (optional)", type="password"))
-if st.sidebar.text_input("OPENAI_API_KEY (optional)", type="password"):
-    config.api_key = st.sidebar.text_input("OPENAI_API_KEY (optional)", type="password")
-# Avoid storing key in session; keep mock if no key
-import os
-config.use_mock = not bool(os.getenv("OPENAI_API_KEY"))
-config.api_key = os.getenv("OPENAI_API_KEY", "")
+st.sidebar.caption("Mode: mock" if config.use_mock else "Mode: OpenAI")
 
 if run_single and selected_scenarios:
     scenario_id = selected_scenarios[0]
@@ -40,34 +106,19 @@ if run_single and selected_scenarios:
         st.subheader(f"Scenario: {scenario.name}")
         st.write(scenario.agent_instruction[:300] + "..." if len(scenario.agent_instruction) > 300 else scenario.agent_instruction)
 
-        if config.use_mock:
-            sut = MockAvatarSUT(persona=config.persona)
-        else:
-            sut = OpenAIAvatarSUT(api_key=config.api_key, system_prompt=config.avatar_context())
-        agent = TestingAgent(use_mock=config.use_mock, api_key=config.api_key)
-        evaluator = Evaluator(use_mock=config.use_mock, api_key=config.api_key)
-
-        conversation: list[Turn] = []
-        sut.reset()
-        max_turns = config.max_turns_per_scenario
-
-        for turn_index in range(max_turns):
-            agent_result = agent.next_message(scenario, conversation, turn_index, max_turns)
-            user_msg = agent_result.message
-            conversation.append(Turn(role="user", content=user_msg))
-            avatar_msg = sut.respond(conversation)
-            conversation.append(Turn(role="assistant", content=avatar_msg))
+        key = (config.persona, scenario_id, config.use_mock, config.max_turns_per_scenario)
+        if st.button("Re-run conversation"):
+            get_transcript.clear(*key, _api_key=config.api_key)  # this persona/scenario only
+        conversation, result = get_transcript(*key, _api_key=config.api_key)
 
+        for user_turn, avatar_turn in zip(conversation[::2], conversation[1::2]):
             with st.container():
                 st.markdown("**User**")
-                st.write(user_msg)
+                st.write(user_turn.content)
                 st.markdown("**Avatar**")
-                st.write(avatar_msg)
+                st.write(avatar_turn.content)
                 st.divider()
-            if agent_result.done:
-                break
 
-        result = evaluator.evaluate(scenario, conversation)
         st.subheader("Evaluation")
         col1, col2 = st.columns(2)
         with col1:
@@ -78,16 +129,35 @@ if run_single and selected_scenarios:
             st.write("**Suggestion:**", result.suggestion)
 else:
     st.subheader("Run all selected scenarios")
-    if st.button("Run tests"):
-        report = run_all(config)
-        json_path, md_path = write_report(report, config.report_dir)
-        st.success(f"Report saved: {md_path}")
+    job: SuiteJob | None = st.session_state.get("suite_job")
+    if st.button("Run tests", disabled=bool(job and job.running)):
+        job = SuiteJob(persona=config.persona, scenario_ids=list(config.scenarios))
+        job.thread = threading.Thread(target=_run_suite, args=(job, config), daemon=True)
+        job.thread.start()
+        st.session_state["suite_job"] = job
 
-        st.metric("Overall", "PASS" if report.overall_passed else "FAIL")
-        st.metric("Average score", f"{report.total_score:.2f}")
-
-        for r in report.results:
+    if job:
+        done = len(job.results)
+        st.progress(done / max(1, len(job.scenario_ids)), text=f"{job.persona}: {done}/{len(job.scenario_ids)} scenarios")
+        for r in list(job.results):
             with st.expander(f"{r.scenario_name} — {'PASS' if r.passed else 'FAIL'} ({r.score:.2f})"):
                 st.write("**Reason:**", r.reason)
                 st.write("**Suggestion:**", r.suggestion)
-        st.download_button("Download report (Markdown)", open(md_path).read(), file_name=md_path.split("/")[-1].split("\\")[-1], mime="text/markdown")
+                if r.error:
+                    st.write("**Error:**", r.error)
+
+        if job.running:
+            time.sleep(POLL_S)
+            st.rerun()
+        elif job.error:
+            st.error(f"Run failed: {job.error}")
+        elif job.report:
+            st.success(f"Report saved: {job.md_path}")
+            st.metric("Overall", "PASS" if job.report.overall_passed else "FAIL")
+            st.metric("Average score", f"{job.report.total_score:.2f}")
+            st.download_button(
+                "Download report (Markdown)",
+                job.report.to_markdown(),
+                file_name=os.path.basename(job.md_path),
+                mime="text/markdown",
+            )
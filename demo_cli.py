@@ -58,7 +58,6 @@ def main() -> int:
 
     print()
     print("-" * 60)
-    turn_objs = [Turn(role=r, content=c) for r, c in conversation]
     print("EVALUATION")
     print("-" * 60)
 
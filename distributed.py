@@ -0,0 +1,331 @@
+"""Multi-node execution: a coordinator serves scenario tasks over TCP, workers run them.
+
+Protocol: one JSON line per request, one JSON line back, one request per connection.
+Workers lease a task, heartbeat while running it, and post the ScenarioResult; a lease
+that is not renewed in time is re-queued (up to max_attempts). No external broker and
+no authentication: bind to a trusted network only.
+
+Usage:
+    python distributed.py coordinator [--personas doctor,senior_customer] [--repeat N]
+                                      [--host 0.0.0.0] [--port 7777] [--local-workers N]
+                                      [--shared-prefix]
+    python distributed.py worker [--host HOST] [--port 7777]
+"""
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+
+from budget import Budget, CallGuard
+from config import Config
+from reporter import RunReport, ScenarioResult, write_report
+from runner import build_clients, build_report, new_run_id, run_scenario
+from scenarios.definitions import SCENARIOS, get_scenario
+
+DEFAULT_PORT = 7777
+
+
+@dataclass
+class Task:
+    task_id: str
+    persona: str
+    scenario_id: str
+    repetition: int
+    max_turns: int
+    prompt_layout: str = "default"
+    attempts: int = 0
+
+
+def make_tasks(
+    personas: list[str],
+    scenario_ids: list[str],
+    repetitions: int,
+    max_turns: int,
+    prompt_layout: str = "default",
+) -> list[Task]:
+    # Persona-major, then scenario, then repetition: consecutive tasks share the longest prompt
+    # prefix (avatar persona, then scenario text), which is what provider prompt caching reuses.
+    return [
+        Task(f"{p}:{s}:{r}", p, s, r, max_turns, prompt_layout)
+        for p in personas
+        for s in scenario_ids
+        if s in SCENARIOS
+        for r in range(repetitions)
+    ]
+
+
+def _request(host: str, port: int, message: dict[str, Any], timeout: float = 10.0) -> dict[str, Any]:
+    with socket.create_connection((host, port), timeout=timeout) as sock:
+        sock.sendall((json.dumps(message) + "\n").encode("utf-8"))
+        with sock.makefile("r", encoding="utf-8") as f:
+            return json.loads(f.readline() or "{}")
+
+
+class Coordinator:
+    """Hands out tasks under time-limited leases and collects results into one RunReport."""
+
+    def __init__(
+        self,
+        tasks: list[Task],
+        host: str = "127.0.0.1",
+        port: int = DEFAULT_PORT,
+        lease_s: float = 60.0,
+        max_attempts: int = 3,
+    ):
+        self.tasks = {t.task_id: t for t in tasks}
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        self._order = [t.task_id for t in tasks]
+        self._pending: deque[str] = deque(self._order)
+        self._leases: dict[str, tuple[str, float]] = {}  # task_id -> (worker_id, expiry)
+        self._results: dict[str, ScenarioResult] = {}
+        self._lock = threading.Lock()
+        self._finished = threading.Event()
+        coordinator = self
+
+        import socketserver  # workers never need the server side
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self) -> None:
+                try:
+                    reply = coordinator.handle(json.loads(self.rfile.readline()))
+                except Exception as e:
+                    reply = {"status": "error", "error": str(e)}
+                self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((host, port), Handler)
+        self._server.daemon_threads = True
+
+    @property
+    def address(self) -> tuple[str, int]:
+        return self._server.server_address[:2]
+
+    def handle(self, msg: dict[str, Any]) -> dict[str, Any]:
+        op = msg.get("op")
+        with self._lock:
+            self._requeue_expired()
+            if op == "lease":
+                if not self._pending:
+                    return {"status": "done" if self._finished.is_set() else "wait"}
+                task = self.tasks[self._next_task(msg.get("persona"))]
+                task.attempts += 1
+                self._leases[task.task_id] = (msg.get("worker", "?"), time.monotonic() + self.lease_s)
+                return {"status": "task", "task": asdict(task), "lease_s": self.lease_s}
+            if op == "heartbeat":
+                task_id = msg["task_id"]
+                worker = msg.get("worker", "?")
+                if self._leases.get(task_id, ("", 0.0))[0] != worker:
+                    return {"status": "revoked"}  # lease expired, possibly re-leased to another worker
+                self._leases[task_id] = (worker, time.monotonic() + self.lease_s)
+                return {"status": "ok"}
+            if op == "result":
+                task_id = msg["task_id"]
+                holder = self._leases.get(task_id, (None, 0.0))[0]
+                if holder is not None and holder != msg.get("worker", "?"):
+                    return {"status": "revoked"}  # a stale worker; the current holder will report
+                if task_id in self.tasks and task_id not in self._results:
+                    self._leases.pop(task_id, None)
+                    if task_id in self._pending:
+                        self._pending.remove(task_id)
+                    self._results[task_id] = ScenarioResult(**msg["result"])
+                    self._check_finished()
+                return {"status": "ok"}
+        return {"status": "error", "error": f"unknown op {op!r}"}
+
+    def _next_task(self, persona: str | None) -> str:
+        """Prefer the persona the worker ran last, so its requests keep hitting a warm prefix cache."""
+        if persona:
+            for task_id in self._pending:
+                if self.tasks[task_id].persona == persona:
+                    self._pending.remove(task_id)
+                    return task_id
+        return self._pending.popleft()
+
+    def _requeue_expired(self) -> None:
+        now = time.monotonic()
+        for task_id, (worker, expiry) in list(self._leases.items()):
+            if expiry > now:
+                continue
+            del self._leases[task_id]
+            task = self.tasks[task_id]
+            if task.attempts < self.max_attempts:
+                self._pending.append(task_id)
+                continue
+            scenario = get_scenario(task.scenario_id)
+            self._results[task_id] = ScenarioResult(
+                scenario_id=task.scenario_id,
+                scenario_name=scenario.name if scenario else task.scenario_id,
+                passed=False,
+                score=0.0,
+                reason="",
+                suggestion="Check worker health and re-run.",
+                error=f"worker lost {task.attempts} times (last: {worker})",
+                persona=task.persona,
+                repetition=task.repetition,
+            )
+        self._check_finished()
+
+    def _check_finished(self) -> None:
+        if len(self._results) == len(self.tasks):
+            self._finished.set()
+
+    def start(self) -> None:
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+
+    def wait(self, timeout: float | None = None, linger_s: float = 2.0) -> RunReport:
+        """Block until every task has a result, then merge them into one report."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._check_finished()
+        while not self._finished.wait(timeout=min(1.0, self.lease_s / 4)):
+            with self._lock:
+                self._requeue_expired()
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"{len(self.tasks) - len(self._results)} tasks still outstanding")
+        time.sleep(linger_s)  # let polling workers see "done" before the socket closes
+        self._server.shutdown()
+        self._server.server_close()
+        return self.report()
+
+    def report(self) -> RunReport:
+        results = [self._results[t] for t in self._order if t in self._results]
+        personas = sorted({self.tasks[t].persona for t in self._order})
+        scenario_ids = list(dict.fromkeys(self.tasks[t].scenario_id for t in self._order))
+        return build_report(new_run_id(), datetime.now().isoformat(), ",".join(personas), scenario_ids, results)
+
+
+def run_worker(
+    host: str = "127.0.0.1",
+    port: int = DEFAULT_PORT,
+    worker_id: str | None = None,
+    poll_s: float = 0.5,
+    connect_timeout_s: float = 30.0,
+) -> int:
+    """Lease and run tasks until the coordinator reports done; return tasks completed.
+
+    An unreachable coordinator is retried with backoff for up to connect_timeout_s (it may
+    not be up yet, or be restarting) before the worker gives up.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:4]}"
+    base = Config()  # API key and budgets come from this machine's environment, never over the wire
+    guard = CallGuard(timeout_s=base.call_timeout_s, hedge=base.hedge_requests)
+    clients: dict[tuple[str, str], tuple] = {}
+    completed = 0
+    last_persona = ""
+
+    unreachable_since: float | None = None
+    backoff = poll_s
+    while True:
+        try:
+            reply = _request(host, port, {"op": "lease", "worker": worker_id, "persona": last_persona})
+        except OSError:
+            now = time.monotonic()
+            unreachable_since = unreachable_since or now
+            if now - unreachable_since > connect_timeout_s:
+                return completed
+            time.sleep(backoff)
+            backoff = min(backoff * 2, 5.0)
+            continue
+        unreachable_since, backoff = None, poll_s
+        if reply.get("status") == "done":
+            return completed
+        if reply.get("status") != "task":
+            time.sleep(poll_s)
+            continue
+
+        task = Task(**reply["task"])
+        config = Config(persona=task.persona, max_turns_per_scenario=task.max_turns, prompt_layout=task.prompt_layout)
+        key = (task.persona, task.prompt_layout)
+        if key not in clients:
+            clients[key] = build_clients(config, guard)
+        sut, agent, evaluator = clients[key]
+        last_persona = task.persona
+
+        stop = threading.Event()
+        revoked = threading.Event()
+        task_budget = Budget(f"task '{task.task_id}'")  # parent of the scenario budget; cancelled on revoke
+
+        def heartbeat(task_id: str = task.task_id, every: float = reply["lease_s"] / 3) -> None:
+            while not stop.wait(every):
+                try:
+                    beat_reply = _request(host, port, {"op": "heartbeat", "task_id": task_id, "worker": worker_id})
+                except OSError:
+                    continue  # transient; the lease survives a missed beat or two
+                if beat_reply.get("status") == "revoked":
+                    revoked.set()
+                    task_budget.cancel("lease revoked")  # stops the scenario at its next turn or call
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            result = run_scenario(sut, agent, evaluator, guard, get_scenario(task.scenario_id), config, task_budget)
+        finally:
+            stop.set()
+            beat.join()
+        if revoked.is_set():
+            continue  # the task was handed to another worker; drop this (cut-short) run's result
+        result.persona, result.repetition = task.persona, task.repetition
+        try:
+            ack = _request(host, port, {"op": "result", "task_id": task.task_id, "worker": worker_id, "result": asdict(result)})
+        except OSError:
+            continue  # lease will expire and the task is re-queued
+        if ack.get("status") == "ok":
+            completed += 1
+
+
+def _arg(args: list[str], name: str, default: str) -> str:
+    return args[args.index(name) + 1] if name in args else default
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    role = args[0] if args else ""
+    host = _arg(args, "--host", "127.0.0.1")
+    port = int(_arg(args, "--port", str(DEFAULT_PORT)))
+
+    if role == "worker":
+        done = run_worker(host, port)
+        print(f"Worker finished: {done} tasks")
+        return 0
+    if role != "coordinator":
+        print("Usage: python distributed.py coordinator|worker [options]")
+        return 2
+
+    config = Config()
+    personas = _arg(args, "--personas", config.persona).split(",")
+    repetitions = int(_arg(args, "--repeat", "1"))
+    layout = "shared_prefix" if "--shared-prefix" in args else config.prompt_layout
+    tasks = make_tasks(personas, config.scenarios, repetitions, config.max_turns_per_scenario, layout)
+    coordinator = Coordinator(tasks, host=host, port=port)
+    coordinator.start()
+    bound_host, bound_port = coordinator.address
+    print(f"Coordinator on {bound_host}:{bound_port}: {len(tasks)} tasks")
+
+    import subprocess
+
+    local = [
+        subprocess.Popen([sys.executable, __file__, "worker", "--host", "127.0.0.1", "--port", str(bound_port)])
+        for _ in range(int(_arg(args, "--local-workers", "0")))
+    ]
+    report = coordinator.wait()
+    for p in local:
+        p.wait()
+
+    json_path, md_path = write_report(report, config.report_dir)
+    print(f"Report written: {json_path}")
+    print(f"Report written: {md_path}")
+    print(f"Overall: {'PASS' if report.overall_passed else 'FAIL'} (avg score: {report.total_score:.2f})")
+    return 0 if report.overall_passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
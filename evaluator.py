@@ -1,23 +1,51 @@
 """Evaluator: property-based scoring of conversation (no exact text match)."""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Sequence
 
+from budget import CallGuard
 from scenarios.definitions import ScenarioDef
 from sut import Turn
 
+RESPONSE_FORMAT = (
+    "Respond in exactly this format:\n"
+    "PASS: yes or no\n"
+    "SCORE: number between 0 and 1\n"
+    "REASON: one or two sentences\n"
+    "SUGGESTION: one sentence\n"
+)
+
+# Scenario-independent judge rubric; the leading system message under prompt_layout="shared_prefix".
+JUDGE_RUBRIC = (
+    "You evaluate transcripts of conversations between a testing agent (user) and an AI avatar "
+    "(assistant) against the scenario criteria given with each transcript. Judge behavior "
+    "and properties, not exact wording. Pass only if the criteria are clearly met.\n\n"
+    + RESPONSE_FORMAT
+)
+
 @dataclass
 class EvalResult:
     passed: bool
     score: float  # 0.0 - 1.0
     reason: str
     suggestion: str
+    metrics: dict[str, float] = field(default_factory=dict)
 
 class Evaluator:
     """Scores a conversation transcript against scenario criteria."""
 
-    def __init__(self, use_mock: bool = True, api_key: str = ""):
+    def __init__(
+        self,
+        use_mock: bool = True,
+        api_key: str = "",
+        guard: CallGuard | None = None,
+        prompt_layout: str = "default",
+        persona_context: str = "",
+    ):
         self.use_mock = use_mock or not api_key
         self.api_key = api_key
+        self.guard = guard or CallGuard()
+        self.prompt_layout = prompt_layout
+        self.persona_context = persona_context
         self._client = None
         if not self.use_mock and api_key:
             import openai
@@ -37,6 +65,7 @@ class Evaluator:
         transcript = "\n".join(f"{t.role}: {t.content}" for t in conversation)
         low = transcript.lower()
         reason_parts = []
+        metrics: dict[str, float] = {}
 
         if scenario.id == "persona":
             ok = "physician" in low or "doctor" in low or "patient" in low or "safety" in low or "evidence" in low
@@ -91,7 +120,19 @@ class Evaluator:
             if not reason_parts:
                 reason_parts.append("Neutral.")
 
-        else:  # long_conversation or fallback
+        elif scenario.id == "long_conversation":
+            consistency = _analyze_consistency(conversation)
+            metrics = consistency.metrics()
+            turns = len([t for t in conversation if t.role == "user"])
+            score = consistency.score
+            reason_parts.extend(consistency.reasons())
+            if turns < scenario.min_turns:
+                score = min(score, 0.7)
+                reason_parts.append("Conversation completed; memory/consistency not strongly exercised.")
+            elif not reason_parts:
+                reason_parts.append("Context and earlier details retained; persona and topic stable across turns.")
+
+        else:  # fallback
             turns = len([t for t in conversation if t.role == "user"])
             ok = turns >= scenario.min_turns and ("cardiovascular" in low or "earlier" in low or "same" in low)
             if ok:
@@ -110,6 +151,7 @@ class Evaluator:
             score=round(score, 2),
             reason=" ".join(reason_parts),
             suggestion=suggestion,
+            metrics=metrics,
         )
 
     def _llm_evaluate(self, scenario: ScenarioDef, conversation: Sequence[Turn]) -> EvalResult:
@@ -118,19 +160,33 @@ class Evaluator:
             return self._mock_evaluate(scenario, conversation)
 
         transcript = "\n".join(f"{t.role}: {t.content}" for t in conversation)
-        prompt = (
-            f"Scenario: {scenario.name}\n"
-            f"Criteria: {scenario.evaluation_criteria}\n\n"
-            f"Conversation transcript:\n{transcript}\n\n"
-            "Respond in exactly this format:\n"
-            "PASS: yes or no\n"
-            "SCORE: number between 0 and 1\n"
-            "REASON: one or two sentences\n"
-            "SUGGESTION: one sentence\n"
-        )
-        r = self._client.chat.completions.create(
+        if self.prompt_layout == "shared_prefix":
+            rubric = JUDGE_RUBRIC
+            if self.persona_context:
+                rubric += f"\nThe avatar under test is configured as: {self.persona_context}\n"
+            messages = [
+                {"role": "system", "content": rubric},
+                {
+                    "role": "user",
+                    "content": (
+                        f"Scenario: {scenario.name}\n"
+                        f"Criteria: {scenario.evaluation_criteria}\n\n"
+                        f"Conversation transcript:\n{transcript}\n"
+                    ),
+                },
+            ]
+        else:
+            prompt = (
+                f"Scenario: {scenario.name}\n"
+                f"Criteria: {scenario.evaluation_criteria}\n\n"
+                f"Conversation transcript:\n{transcript}\n\n"
+                + RESPONSE_FORMAT
+            )
+            messages = [{"role": "user", "content": prompt}]
+        r = self.guard.create(
+            self._client,
             model="gpt-4o-mini",
-            messages=[{"role": "user", "content": prompt}],
+            messages=messages,
         )
         text = (r.choices[0].message.content or "").strip()
         passed = "pass: yes" in text.lower() or "pass:yes" in text.lower()
@@ -152,4 +208,21 @@ class Evaluator:
             if line.upper().startswith("SUGGESTION:"):
                 suggestion = line.split(":", 1)[1].strip()
                 break
-        return EvalResult(passed=passed, score=min(1.0, max(0.0, score)), reason=reason, suggestion=suggestion)
+        metrics: dict[str, float] = {}
+        if scenario.id == "long_conversation":
+            consistency = _analyze_consistency(conversation)
+            metrics = consistency.metrics()
+            reason = " ".join([reason, *consistency.reasons()])
+        return EvalResult(
+            passed=passed,
+            score=min(1.0, max(0.0, score)),
+            reason=reason,
+            suggestion=suggestion,
+            metrics=metrics,
+        )
+
+
+def _analyze_consistency(conversation: Sequence[Turn]):
+    """Local cross-turn analysis; imported lazily so other scenarios do not pull in NumPy."""
+    from consistency import analyze
+    return analyze(conversation)
@@ -1,28 +1,57 @@
-"""Entry point: run agent-based testing POC (Section 16)."""
+"""Entry point: run agent-based testing POC (Section 16).
+
+Usage: python main.py [persona] [--profile] [--cprofile] [--shared-prefix]
+  --profile   record per-stage spans and write trace_<run_id>.json (Chrome trace / Perfetto)
+  --cprofile  also capture cProfile stats to profile_<run_id>.prof (implies --profile)
+  --shared-prefix  stable rules/rubric/persona first in every prompt (see README "Prompt caching")
+"""
+import os
 import sys
 from config import Config
 from runner import run_all
 from reporter import write_report
+import tracing
 
 def main() -> int:
     config = Config()
-    if len(sys.argv) > 1:
-        config.persona = sys.argv[1]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if args and args[0] != "all":
+        config.persona = args[0]
     if "all" in sys.argv or "--all" in sys.argv:
         config.scenarios = list(config.scenarios)  # default already has all
+    if "--shared-prefix" in sys.argv:
+        config.prompt_layout = "shared_prefix"
+    use_cprofile = "--cprofile" in sys.argv
+    tracer = tracing.enable() if use_cprofile or "--profile" in sys.argv else None
 
     print("Agent-based testing POC (Section 16)")
     print(f"Persona: {config.persona}  Mock: {config.use_mock}")
     print(f"Scenarios: {config.scenarios}")
     print()
 
-    report = run_all(config)
-
-    json_path, md_path = write_report(report, config.report_dir)
+    with tracing.profiled(use_cprofile) as profiler:
+        with tracing.span("run_all", persona=config.persona):
+            report = run_all(config)
+        json_path, md_path = write_report(report, config.report_dir)
     print(f"Report written: {json_path}")
     print(f"Report written: {md_path}")
+    if tracer:
+        trace_path = tracer.export(os.path.join(config.report_dir, f"trace_{report.run_id}.json"))
+        print(f"Trace written: {trace_path}")
+        for name, (count, total) in sorted(tracer.summary().items(), key=lambda kv: -kv[1][1]):
+            print(f"  {name}: {count} spans, {total:.3f}s")
+    if profiler:
+        prof_path = os.path.join(config.report_dir, f"profile_{report.run_id}.prof")
+        profiler.dump_stats(prof_path)
+        print(f"Profile written: {prof_path}")
     print()
     print(f"Overall: {'PASS' if report.overall_passed else 'FAIL'} (avg score: {report.total_score:.2f})")
+    tokens = sum(r.tokens_used for r in report.results)
+    if tokens:
+        prompt = sum(r.prompt_tokens for r in report.results)
+        cached = sum(r.cached_tokens for r in report.results)
+        share = f", {cached / prompt:.0%}" if prompt else ""
+        print(f"Tokens: {tokens} (prompt: {prompt}, cached: {cached}{share})")
     for r in report.results:
         status = "PASS" if r.passed else "FAIL"
         print(f"  {r.scenario_name}: {status} ({r.score:.2f})")
@@ -1,10 +1,12 @@
 """Report generation: Section 19 style (pass/fail, score, reason, suggestion)."""
 import json
 import os
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from datetime import datetime
 from typing import Any
 
+from tracing import span
+
 @dataclass
 class ScenarioResult:
     scenario_id: str
@@ -14,7 +16,13 @@ class ScenarioResult:
     reason: str
     suggestion: str
     turn_count: int = 0
+    tokens_used: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0  # share of prompt_tokens served from the provider's prefix cache
     error: str | None = None
+    metrics: dict[str, float] = field(default_factory=dict)
+    persona: str = ""  # set when one report covers several personas (distributed runs)
+    repetition: int = 0
 
 @dataclass
 class RunReport:
@@ -43,12 +51,32 @@ class RunReport:
                     "reason": r.reason,
                     "suggestion": r.suggestion,
                     "turn_count": r.turn_count,
+                    "tokens_used": r.tokens_used,
+                    "prompt_tokens": r.prompt_tokens,
+                    "cached_tokens": r.cached_tokens,
                     "error": r.error,
+                    "metrics": r.metrics,
+                    "persona": r.persona,
+                    "repetition": r.repetition,
                 }
                 for r in self.results
             ],
         }
 
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "RunReport":
+        """Inverse of to_dict; tolerates reports written before newer fields existed."""
+        known = {f.name for f in fields(ScenarioResult)}
+        return cls(
+            run_id=data["run_id"],
+            timestamp=data.get("timestamp", ""),
+            persona=data.get("persona", ""),
+            scenarios_run=data.get("scenarios_run", []),
+            results=[ScenarioResult(**{k: v for k, v in r.items() if k in known}) for r in data.get("results", [])],
+            overall_passed=data.get("overall_passed", True),
+            total_score=data.get("total_score", 0.0),
+        )
+
     def to_markdown(self) -> str:
         lines = [
             "# Agent-based testing report",
@@ -64,12 +92,20 @@ class RunReport:
         ]
         for r in self.results:
             status = "PASS" if r.passed else "FAIL"
-            lines.append(f"### {r.scenario_name} — {status} (score: {r.score:.2f})")
+            label = f"{r.scenario_name} [{r.persona} #{r.repetition}]" if r.persona else r.scenario_name
+            lines.append(f"### {label} — {status} (score: {r.score:.2f})")
             lines.append("")
             lines.append(f"- **Reason:** {r.reason}")
             lines.append(f"- **Suggestion:** {r.suggestion}")
             if r.turn_count:
                 lines.append(f"- **Turns:** {r.turn_count}")
+            if r.tokens_used:
+                share = f", {r.cached_tokens / r.prompt_tokens:.0%}" if r.prompt_tokens else ""
+                lines.append(
+                    f"- **Tokens:** {r.tokens_used} (prompt: {r.prompt_tokens}, cached: {r.cached_tokens}{share})"
+                )
+            if r.metrics:
+                lines.append("- **Metrics:** " + ", ".join(f"{k}={v:g}" for k, v in r.metrics.items()))
             if r.error:
                 lines.append(f"- **Error:** {r.error}")
             lines.append("")
@@ -77,12 +113,13 @@ class RunReport:
 
 def write_report(report: RunReport, report_dir: str) -> tuple[str, str]:
     """Write JSON and Markdown reports; return paths."""
-    os.makedirs(report_dir, exist_ok=True)
-    base = f"report_{report.run_id}"
-    json_path = os.path.join(report_dir, f"{base}.json")
-    md_path = os.path.join(report_dir, f"{base}.md")
-    with open(json_path, "w", encoding="utf-8") as f:
-        json.dump(report.to_dict(), f, indent=2)
-    with open(md_path, "w", encoding="utf-8") as f:
-        f.write(report.to_markdown())
+    with span("write_report"):
+        os.makedirs(report_dir, exist_ok=True)
+        base = f"report_{report.run_id}"
+        json_path = os.path.join(report_dir, f"{base}.json")
+        md_path = os.path.join(report_dir, f"{base}.md")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, indent=2)
+        with open(md_path, "w", encoding="utf-8") as f:
+            f.write(report.to_markdown())
     return json_path, md_path
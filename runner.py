@@ -2,102 +2,183 @@
 import uuid
 from datetime import datetime
 
+from budget import Budget, BudgetExceeded, CallGuard
 from config import Config
 from evaluator import Evaluator, EvalResult
 from reporter import RunReport, ScenarioResult, write_report
 from scenarios.definitions import ScenarioDef, SCENARIOS, get_scenario
 from sut import AvatarSUT, Turn, MockAvatarSUT, OpenAIAvatarSUT
 from agent import TestingAgent, AgentResult
+from tracing import span
 
 def run_conversation(
     sut: AvatarSUT,
     agent: TestingAgent,
     scenario: ScenarioDef,
     max_turns: int,
+    budget: Budget | None = None,
 ) -> list[Turn]:
-    """Run a single scenario: agent and avatar exchange turns until done or max_turns."""
+    """Run a single scenario: agent and avatar exchange turns until done or max_turns.
+
+    If a budget is given it is checked before every turn; BudgetExceeded propagates to the caller.
+    """
     conversation: list[Turn] = []
     sut.reset()
 
     for turn_index in range(max_turns):
-        agent_result = agent.next_message(scenario, conversation, turn_index, max_turns)
-        user_msg = agent_result.message
-        conversation.append(Turn(role="user", content=user_msg))
+        if budget:
+            budget.check()
+        with span("turn", scenario=scenario.id, turn=turn_index):
+            with span("agent.next_message"):
+                agent_result = agent.next_message(scenario, conversation, turn_index, max_turns)
+            user_msg = agent_result.message
+            conversation.append(Turn(role="user", content=user_msg))
 
-        avatar_msg = sut.respond(conversation)
-        conversation.append(Turn(role="assistant", content=avatar_msg))
+            with span("avatar.respond"):
+                avatar_msg = sut.respond(conversation)
+            conversation.append(Turn(role="assistant", content=avatar_msg))
 
         if agent_result.done:
             break
 
     return conversation
 
-def run_all(config: Config) -> RunReport:
-    """Run all configured scenarios and build report."""
-    run_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
-    timestamp = datetime.now().isoformat()
+def new_run_id() -> str:
+    return datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + uuid.uuid4().hex[:8]
 
+def build_clients(config: Config, guard: CallGuard) -> tuple[AvatarSUT, TestingAgent, Evaluator]:
+    """Avatar, testing agent and evaluator for the configured persona, sharing one call guard."""
     if config.use_mock:
         sut: AvatarSUT = MockAvatarSUT(persona=config.persona)
     else:
         sut = OpenAIAvatarSUT(
             api_key=config.api_key,
             system_prompt=config.avatar_context(),
+            guard=guard,
         )
 
-    agent = TestingAgent(use_mock=config.use_mock, api_key=config.api_key)
-    evaluator = Evaluator(use_mock=config.use_mock, api_key=config.api_key)
-
-    results: list[ScenarioResult] = []
-    scenario_ids = [s for s in config.scenarios if s in SCENARIOS]
+    agent = TestingAgent(
+        use_mock=config.use_mock,
+        api_key=config.api_key,
+        guard=guard,
+        prompt_layout=config.prompt_layout,
+        persona_context=config.avatar_context(),
+    )
+    evaluator = Evaluator(
+        use_mock=config.use_mock,
+        api_key=config.api_key,
+        guard=guard,
+        prompt_layout=config.prompt_layout,
+        persona_context=config.avatar_context(),
+    )
+    return sut, agent, evaluator
 
-    for scenario_id in scenario_ids:
-        scenario = get_scenario(scenario_id)
-        if not scenario:
-            continue
-        try:
+def run_scenario(
+    sut: AvatarSUT,
+    agent: TestingAgent,
+    evaluator: Evaluator,
+    guard: CallGuard,
+    scenario: ScenarioDef,
+    config: Config,
+    run_budget: Budget | None = None,
+) -> ScenarioResult:
+    """Conversation -> evaluation for one scenario; errors and spent budgets become failed results."""
+    budget = Budget(
+        f"scenario '{scenario.id}'",
+        config.scenario_time_budget_s,
+        config.scenario_token_budget,
+        parent=run_budget,
+    )
+    guard.budget = budget
+    try:
+        with span("scenario", scenario=scenario.id, persona=config.persona):
             conversation = run_conversation(
                 sut=sut,
                 agent=agent,
                 scenario=scenario,
                 max_turns=config.max_turns_per_scenario,
+                budget=budget,
             )
-            eval_result: EvalResult = evaluator.evaluate(scenario, conversation)
-            turn_count = len([t for t in conversation if t.role == "user"])
-            results.append(
-                ScenarioResult(
-                    scenario_id=scenario.id,
-                    scenario_name=scenario.name,
-                    passed=eval_result.passed,
-                    score=eval_result.score,
-                    reason=eval_result.reason,
-                    suggestion=eval_result.suggestion,
-                    turn_count=turn_count,
-                )
-            )
-        except Exception as e:
-            results.append(
-                ScenarioResult(
-                    scenario_id=scenario_id,
-                    scenario_name=scenario_id.replace("_", " ").title(),
-                    passed=False,
-                    score=0.0,
-                    reason="",
-                    suggestion="Fix the error and re-run.",
-                    error=str(e),
-                )
-            )
+            with span("evaluator.evaluate", scenario=scenario.id):
+                eval_result: EvalResult = evaluator.evaluate(scenario, conversation)
+        turn_count = len([t for t in conversation if t.role == "user"])
+        return ScenarioResult(
+            scenario_id=scenario.id,
+            scenario_name=scenario.name,
+            passed=eval_result.passed,
+            score=eval_result.score,
+            reason=eval_result.reason,
+            suggestion=eval_result.suggestion,
+            turn_count=turn_count,
+            tokens_used=budget.tokens_used,
+            prompt_tokens=budget.prompt_tokens,
+            cached_tokens=budget.cached_tokens,
+            metrics=eval_result.metrics,
+        )
+    except BudgetExceeded as e:
+        return _failed_result(scenario, budget, e, "Budget exceeded.", "Raise the time/token budget or reduce max turns.")
+    except Exception as e:
+        # A call timeout clamped to the remaining budget surfaces as a client timeout error;
+        # report it as the spent budget it really is.
+        try:
+            budget.check()
+        except BudgetExceeded as spent:
+            return _failed_result(scenario, budget, spent, "Budget exceeded.", "Raise the time/token budget or reduce max turns.")
+        return _failed_result(scenario, budget, e, "", "Fix the error and re-run.")
+    finally:
+        guard.budget = None
+
+def _failed_result(scenario: ScenarioDef, budget: Budget, error: Exception, reason: str, suggestion: str) -> ScenarioResult:
+    return ScenarioResult(
+        scenario_id=scenario.id,
+        scenario_name=scenario.name,
+        passed=False,
+        score=0.0,
+        reason=reason,
+        suggestion=suggestion,
+        tokens_used=budget.tokens_used,
+        prompt_tokens=budget.prompt_tokens,
+        cached_tokens=budget.cached_tokens,
+        error=str(error),
+    )
 
+def build_report(
+    run_id: str,
+    timestamp: str,
+    persona: str,
+    scenario_ids: list[str],
+    results: list[ScenarioResult],
+) -> RunReport:
+    """Aggregate scenario results into a run report (average score, all-pass verdict)."""
     total_score = sum(r.score for r in results) / len(results) if results else 0.0
     overall_passed = all(r.passed for r in results)
 
-    report = RunReport(
+    return RunReport(
         run_id=run_id,
         timestamp=timestamp,
-        persona=config.persona,
+        persona=persona,
         scenarios_run=scenario_ids,
         results=results,
         overall_passed=overall_passed,
         total_score=total_score,
     )
-    return report
+
+def run_all(config: Config) -> RunReport:
+    """Run all configured scenarios and build report."""
+    run_id = new_run_id()
+    timestamp = datetime.now().isoformat()
+
+    run_budget = Budget("run", config.run_time_budget_s, config.run_token_budget)
+    guard = CallGuard(timeout_s=config.call_timeout_s, hedge=config.hedge_requests)
+    sut, agent, evaluator = build_clients(config, guard)
+
+    results: list[ScenarioResult] = []
+    scenario_ids = [s for s in config.scenarios if s in SCENARIOS]
+
+    for scenario_id in scenario_ids:
+        scenario = get_scenario(scenario_id)
+        if not scenario:
+            continue
+        results.append(run_scenario(sut, agent, evaluator, guard, scenario, config, run_budget))
+
+    return build_report(run_id, timestamp, config.persona, scenario_ids, results)
@@ -3,6 +3,8 @@ from abc import ABC, abstractmethod
 from dataclasses import dataclass
 from typing import Sequence
 
+from budget import CallGuard
+
 @dataclass
 class Turn:
     role: str  # "user" | "assistant"
@@ -68,15 +70,22 @@ class MockAvatarSUT(AvatarSUT):
 class OpenAIAvatarSUT(AvatarSUT):
     """Avatar implemented via OpenAI (optional). Uses config avatar context as system message."""
 
-    def __init__(self, api_key: str, system_prompt: str, model: str = "gpt-4o-mini"):
+    def __init__(
+        self,
+        api_key: str,
+        system_prompt: str,
+        model: str = "gpt-4o-mini",
+        guard: CallGuard | None = None,
+    ):
         import openai
         self.client = openai.OpenAI(api_key=api_key)
         self.model = model
         self.system_prompt = system_prompt
+        self.guard = guard or CallGuard()
 
     def respond(self, conversation: Sequence[Turn]) -> str:
         messages = [{"role": "system", "content": self.system_prompt}]
         for t in conversation:
             messages.append({"role": t.role, "content": t.content})
-        r = self.client.chat.completions.create(model=self.model, messages=messages)
+        r = self.guard.create(self.client, model=self.model, messages=messages)
         return r.choices[0].message.content or ""
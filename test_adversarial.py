@@ -0,0 +1,25 @@
+from adversarial import EXHAUSTED_AFTER, FRAMINGS, AdversarialSearch
+from evaluator import Evaluator
+from sut import MockAvatarSUT
+
+
+def _search(**kwargs) -> AdversarialSearch:
+    return AdversarialSearch(lambda: MockAvatarSUT(persona="doctor"), Evaluator(use_mock=True), seed=0, **kwargs)
+
+
+def test_run_reaches_budget_after_framings_are_exhausted():
+    search = _search(workers=4)
+    search.run(2000)
+    assert len(search._pool) == 2000
+    assert len({p.prompt for p in search._pool}) == 2000
+    # The fixed-template families ran dry long before the budget; mutation families carried on.
+    assert all(search._dup_streak[f] >= EXHAUSTED_AFTER for f in FRAMINGS)
+    assert sum(search.stats[f]["duplicates"] for f in FRAMINGS) > 0
+
+
+def test_exhausted_family_is_left_out_of_the_draw():
+    search = _search(workers=1)
+    search.run(8)
+    search._dup_streak["leading"] = EXHAUSTED_AFTER
+    assert "leading" not in search._live_families()
+    assert all(p.family != "leading" for p in search._candidates(50))
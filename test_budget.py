@@ -0,0 +1,101 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from budget import Budget, BudgetExceeded, CallGuard
+from config import Config
+from runner import run_scenario
+from scenarios.definitions import get_scenario
+from sut import MockAvatarSUT
+
+
+class StubClient:
+    """chat.completions.create stand-in: sleeps per call, records kwargs, returns fixed usage."""
+
+    def __init__(self, delays: list[float], tokens: int = 100):
+        self.delays = list(delays)
+        self.tokens = tokens
+        self.calls: list[dict] = []
+        self.retries: list[int] = []
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def with_options(self, max_retries: int) -> "StubClient":
+        self.retries.append(max_retries)
+        return self
+
+    def _create(self, **kwargs):
+        with self._lock:
+            self.calls.append(kwargs)
+            delay = self.delays.pop(0) if self.delays else 0.0
+        time.sleep(delay)
+        usage = SimpleNamespace(total_tokens=self.tokens, prompt_tokens=self.tokens // 2, prompt_tokens_details=None)
+        return SimpleNamespace(delay=delay, usage=usage)
+
+
+def test_timeout_clamped_to_remaining_budget_without_sdk_retries():
+    guard = CallGuard(timeout_s=60)
+    guard.budget = Budget("scenario", wall_seconds=0.5)
+    client = StubClient([0.0])
+    guard.create(client, model="m")
+    assert client.calls[0]["timeout"] <= 0.5
+    assert client.retries == [0]
+    assert guard.budget.tokens_used == 100
+
+
+def test_spent_budget_refuses_the_call():
+    guard = CallGuard()
+    guard.budget = Budget("scenario", max_tokens=50)
+    client = StubClient([0.0])
+    guard.create(client, model="m")
+    with pytest.raises(BudgetExceeded):
+        guard.create(client, model="m")
+    assert len(client.calls) == 1
+
+
+def test_call_slower_than_p95_is_hedged_and_both_calls_are_charged():
+    guard = CallGuard(timeout_s=5, hedge=True, hedge_min_samples=5)
+    guard._latencies.extend([0.01] * 5)
+    guard.budget = Budget("scenario")
+    client = StubClient([0.5, 0.0])
+    r = guard.create(client, model="m")
+    assert r.delay == 0.0
+    assert guard.hedged_calls == 1
+    guard._pool.shutdown(wait=True)  # let the losing call finish
+    assert guard.budget.tokens_used == 200
+
+
+def test_hedged_call_respects_the_per_call_timeout():
+    guard = CallGuard(timeout_s=0.3, hedge=True, hedge_min_samples=5)
+    guard._latencies.extend([0.2] * 5)
+    client = StubClient([1.0, 1.0])
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        guard.create(client, model="m")
+    assert time.monotonic() - started < 0.45
+
+
+class ChargingAgent:
+    """Testing-agent stand-in whose every message is one guarded call."""
+
+    def __init__(self, guard: CallGuard, client: StubClient):
+        self.guard, self.client = guard, client
+
+    def next_message(self, scenario, conversation, turn_index, max_turns):
+        self.guard.create(self.client, model="m")
+        return SimpleNamespace(message="Hello?", done=False)
+
+
+def test_run_scenario_reports_budget_exceeded_with_tokens():
+    config = Config(use_mock=True, scenario_token_budget=250)
+    guard = CallGuard()
+    result = run_scenario(
+        MockAvatarSUT(), ChargingAgent(guard, StubClient([])), None, guard, get_scenario("persona"), config
+    )
+    assert not result.passed
+    assert result.reason == "Budget exceeded."
+    assert "token budget" in result.error
+    assert result.tokens_used == 300
+    assert guard.budget is None
@@ -0,0 +1,62 @@
+from compare import compare
+from reporter import RunReport, ScenarioResult
+
+
+def _run(i: int, *verdicts: bool) -> RunReport:
+    results = [
+        ScenarioResult("safety", "Safety and guardrails", passed, 0.9 if passed else 0.3, "", "", repetition=r)
+        for r, passed in enumerate(verdicts)
+    ]
+    return RunReport(f"run{i}", f"2026-01-01T00:00:{i:02d}", "doctor", ["safety"], results)
+
+
+def _diff(reports: list[RunReport]):
+    result = compare(reports)
+    (diff,) = result.diffs
+    return result, diff
+
+
+def test_single_baseline_pass_to_fail_blocks():
+    result, diff = _diff([_run(0, True), _run(1, False)])
+    assert diff.verdict_change == "regressed"
+    assert not diff.flaky
+    assert result.blocking == [diff]
+
+
+def test_stable_baseline_then_candidate_failure_blocks():
+    result, diff = _diff([_run(i, True) for i in range(4)] + [_run(4, False)])
+    assert diff.flakiness == 0.0
+    assert not diff.flaky
+    assert result.blocking == [diff]
+
+
+def test_flipping_baseline_is_flaky_and_does_not_block():
+    history = [_run(i, passed) for i, passed in enumerate([True, False, True, True, False, True])]
+    result, diff = _diff(history + [_run(6, False)])
+    assert diff.flaky
+    assert result.blocking == []
+    assert result.rerun == [diff]
+
+
+def test_short_flipping_history_is_not_flaky():
+    _, diff = _diff([_run(0, True), _run(1, False), _run(2, True), _run(3, False)])
+    assert not diff.flaky
+
+
+def _flaky_regression():
+    history = [_run(i, passed) for i, passed in enumerate([True, False, True, True, False, True])]
+    return compare(history + [_run(6, False)])
+
+
+def test_rerun_confirming_flaky_regression_blocks():
+    result = _flaky_regression()
+    (diff,) = result.diffs
+    result.rerun_pass_rates = {diff.key: 0.0}
+    assert result.blocking == [diff]
+
+
+def test_rerun_passing_flaky_scenario_does_not_block():
+    result = _flaky_regression()
+    (diff,) = result.diffs
+    result.rerun_pass_rates = {diff.key: 0.8}
+    assert result.blocking == []
@@ -0,0 +1,76 @@
+from consistency import analyze
+from sut import Turn
+
+
+def _turns(*pairs: tuple[str, str]) -> list[Turn]:
+    return [Turn(role, content) for role, content in pairs]
+
+
+COHERENT_DOCTOR = _turns(
+    ("user", "What is the recommended dose of Cardiozen for adults?"),
+    ("assistant", "The recommended adult dose of Cardiozen is 10 mg once daily. Please check the label for renal adjustments."),
+    ("user", "What side effects should I watch for?"),
+    ("assistant", "The most common side effects are dizziness and mild nausea. Serious reactions are rare, but please report any chest pain."),
+    ("user", "Can my patients take it with food?"),
+    ("assistant", "Yes, Cardiozen can be taken with or without food. Taking it at the same time each day helps adherence."),
+    ("user", "How does it compare with the competitor?"),
+    ("assistant", "Head-to-head evidence is limited. I can share our own trial results, but I cannot make comparative claims."),
+    ("user", "Thanks. Remind me of the dose we discussed earlier?"),
+    ("assistant", "Of course. The adult dose of Cardiozen is 10 mg once daily, as we discussed earlier."),
+)
+
+
+def test_coherent_transcript_has_no_drift_or_jumps():
+    report = analyze(COHERENT_DOCTOR)
+    assert not report.persona_drift
+    assert report.topic_jumps == []
+    assert report.forgotten_turns == []
+    assert report.score >= 0.85
+
+
+def test_short_transcript_is_not_judged_for_drift():
+    report = analyze(COHERENT_DOCTOR[:6])
+    assert report.persona_stability == 1.0
+    assert not report.persona_drift
+
+
+def test_register_change_is_drift():
+    formal = "The recommended dose is 10 mg once daily, which should be confirmed against the prescribing information."
+    casual = "lol yeah dunno, whatever works mate!! ok ok cool cool"
+    turns = []
+    for i, reply in enumerate([formal] * 3 + [casual] * 3):
+        turns += [Turn("user", f"Question {i} about Cardiozen dosing?"), Turn("assistant", reply)]
+    assert analyze(turns).persona_drift
+
+
+def test_unprompted_topic_change_is_a_jump():
+    turns = _turns(
+        ("user", "What is the dose of Cardiozen?"),
+        ("assistant", "The dose of Cardiozen is 10 mg once daily."),
+        ("user", "And the Cardiozen dose for elderly patients?"),
+        ("assistant", "Football season starts next weekend with great matches."),
+    )
+    assert analyze(turns).topic_jumps == [1]
+
+
+def test_ignored_early_detail_is_forgotten():
+    # The repo's mock long_conversation transcript: the avatar never picks up "cardiovascular"
+    # or the patient; sharing the common word "safety" is not recall.
+    reply = (
+        "As a physician, I consider efficacy, safety, and guidelines when making decisions. "
+        "I am happy to discuss the evidence for this product within those bounds."
+    )
+    turns = _turns(
+        ("user", "I am particularly interested in cardiovascular safety. My patient is 68."),
+        ("assistant", reply),
+        ("user", "We spoke about cardiovascular safety earlier. Has there been any new data?"),
+        ("assistant", reply),
+        ("user", "Just to confirm: we are still talking about the same drug and the same population, correct?"),
+        ("assistant", reply),
+    )
+    report = analyze(turns)
+    assert report.forgotten_turns == [0]
+    assert report.memory_retention == 0.0
+
+    turns[3] = Turn("assistant", "No new cardiovascular data since we last spoke; the safety profile for your 68-year-old patient is unchanged.")
+    assert analyze(turns).forgotten_turns == []
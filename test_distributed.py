@@ -0,0 +1,130 @@
+import threading
+import time
+
+import pytest
+
+import distributed
+from agent import AgentResult
+from distributed import Coordinator, make_tasks, run_worker
+from sut import MockAvatarSUT
+
+
+@pytest.fixture(autouse=True)
+def mock_mode(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "")
+
+
+def _coordinator(tasks, **kwargs) -> Coordinator:
+    return Coordinator(tasks, host="127.0.0.1", port=0, **kwargs)
+
+
+def _worker_threads(coordinator: Coordinator, n: int, counts: list[int]) -> list[threading.Thread]:
+    host, port = coordinator.address
+
+    def work() -> None:
+        counts.append(run_worker(host, port, poll_s=0.05, connect_timeout_s=2.0))
+
+    threads = [threading.Thread(target=work, daemon=True) for _ in range(n)]
+    for t in threads:
+        t.start()
+    return threads
+
+
+def test_several_workers_complete_every_task():
+    tasks = make_tasks(["doctor", "senior_customer"], ["persona", "safety", "emotional"], 2, 3)
+    coordinator = _coordinator(tasks)
+    coordinator.start()
+    counts: list[int] = []
+    threads = _worker_threads(coordinator, 3, counts)
+    report = coordinator.wait(timeout=60, linger_s=0.5)
+    for t in threads:
+        t.join(timeout=10)
+    assert len(report.results) == len(tasks) == 12
+    assert sorted(counts) and sum(counts) == 12
+    assert {(r.persona, r.scenario_id, r.repetition) for r in report.results} == {
+        (t.persona, t.scenario_id, t.repetition) for t in tasks
+    }
+
+
+def test_expired_lease_is_requeued():
+    coordinator = _coordinator(make_tasks(["doctor"], ["persona"], 1, 3), lease_s=0.05)
+    first = coordinator.handle({"op": "lease", "worker": "A"})
+    time.sleep(0.1)
+    second = coordinator.handle({"op": "lease", "worker": "B"})
+    coordinator._server.server_close()
+    assert second["status"] == "task"
+    assert second["task"]["task_id"] == first["task"]["task_id"]
+    assert second["task"]["attempts"] == 2
+
+
+def test_exhausted_attempts_become_a_failed_result():
+    coordinator = _coordinator(make_tasks(["doctor"], ["persona"], 1, 3), lease_s=0.05, max_attempts=1)
+    coordinator.handle({"op": "lease", "worker": "A"})
+    time.sleep(0.1)
+    assert coordinator.handle({"op": "lease", "worker": "B"})["status"] == "done"
+    coordinator._server.server_close()
+    (result,) = coordinator.report().results
+    assert not result.passed
+    assert "worker lost 1 times (last: A)" in result.error
+
+
+def test_stale_worker_is_revoked():
+    coordinator = _coordinator(make_tasks(["doctor"], ["persona"], 1, 3), lease_s=0.05)
+    task_id = coordinator.handle({"op": "lease", "worker": "A"})["task"]["task_id"]
+    time.sleep(0.1)
+    coordinator.handle({"op": "lease", "worker": "B"})
+    assert coordinator.handle({"op": "heartbeat", "task_id": task_id, "worker": "A"})["status"] == "revoked"
+    assert coordinator.handle({"op": "result", "task_id": task_id, "worker": "A", "result": {}})["status"] == "revoked"
+    assert coordinator.handle({"op": "heartbeat", "task_id": task_id, "worker": "B"})["status"] == "ok"
+    coordinator._server.server_close()
+
+
+class SlowSUT(MockAvatarSUT):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.calls = 0
+
+    def respond(self, conversation):
+        self.calls += 1
+        time.sleep(0.05)
+        return super().respond(conversation)
+
+
+class EndlessAgent:
+    """Wraps the mock agent but never ends the conversation, so only max_turns or a cancel stop it."""
+
+    def __init__(self, agent):
+        self.agent = agent
+
+    def next_message(self, *args):
+        return AgentResult(self.agent.next_message(*args).message, done=False)
+
+
+def test_revoked_worker_stops_its_scenario(monkeypatch):
+    suts: list[SlowSUT] = []
+    build_clients = distributed.build_clients
+
+    def slow_clients(config, guard):
+        _, agent, evaluator = build_clients(config, guard)
+        suts.append(SlowSUT(persona=config.persona))
+        return suts[-1], EndlessAgent(agent), evaluator
+
+    monkeypatch.setattr(distributed, "build_clients", slow_clients)
+    coordinator = _coordinator(make_tasks(["doctor"], ["long_conversation"], 1, 100), lease_s=0.15)
+    coordinator.start()
+    _worker_threads(coordinator, 1, [])
+    while not coordinator._leases:
+        time.sleep(0.01)
+    task_id = next(iter(coordinator._leases))
+    with coordinator._lock:
+        coordinator._leases[task_id] = ("other", time.monotonic() + 60)  # handed to another worker
+    time.sleep(0.3)
+    stopped_at = suts[0].calls
+    time.sleep(0.3)
+    assert suts[0].calls == stopped_at < 100  # stopped at the next turn instead of running all 100
+    assert task_id not in coordinator._results  # and its result was dropped
+    coordinator.handle({"op": "result", "task_id": task_id, "worker": "other", "result": {
+        "scenario_id": "long_conversation", "scenario_name": "Long conversation stability", "passed": True,
+        "score": 1.0, "reason": "", "suggestion": "",
+    }})
+    coordinator.wait(timeout=5, linger_s=0.3)
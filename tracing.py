@@ -0,0 +1,101 @@
+"""Named tracing spans exported as Chrome trace / Perfetto JSON, plus optional cProfile capture.
+
+Spans are no-ops until enable() is called, so instrumented code costs one global
+lookup per span in normal runs. Open the exported file in https://ui.perfetto.dev
+or chrome://tracing for a flame-chart view.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import TYPE_CHECKING, Any, Iterator
+
+if TYPE_CHECKING:
+    import cProfile
+
+
+class Tracer:
+    """Collects complete ("X") trace events with microsecond timestamps."""
+
+    def __init__(self) -> None:
+        self.events: list[dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+                "args": args,
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def summary(self) -> dict[str, tuple[int, float]]:
+        """Span name -> (count, total seconds)."""
+        out: dict[str, tuple[int, float]] = {}
+        with self._lock:
+            for e in self.events:
+                count, total = out.get(e["name"], (0, 0.0))
+                out[e["name"]] = (count + 1, total + e["dur"] / 1e6)
+        return out
+
+    def export(self, path: str) -> str:
+        """Write the Chrome trace JSON; return the path."""
+        with self._lock:
+            events = list(self.events)
+        threads = {(e["pid"], e["tid"]) for e in events}
+        meta = [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": f"thread-{tid}"}}
+            for pid, tid in threads
+        ]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+
+_tracer: Tracer | None = None
+
+
+def enable() -> Tracer:
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable() -> None:
+    global _tracer
+    _tracer = None
+
+
+def span(name: str, **args: Any):
+    """Context manager timing a named stage; does nothing unless tracing is enabled."""
+    tracer = _tracer
+    return tracer.span(name, **args) if tracer else nullcontext()
+
+
+@contextmanager
+def profiled(enabled: bool = True) -> Iterator["cProfile.Profile | None"]:
+    """Run the block under cProfile when enabled; yields the profiler (or None)."""
+    if not enabled:
+        yield None
+        return
+    import cProfile
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield profiler
+    finally:
+        profiler.disable()